@@ -0,0 +1,66 @@
+"""In-process TTL cache for upstream API responses that change slowly"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded cache whose entries expire a fixed number of seconds after being stored.
+
+    Expired entries are kept around until evicted so they can be served as a
+    fallback when refreshing them from upstream fails, unless serve_stale is False.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 256, serve_stale: bool = True):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.serve_stale = serve_stale
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, allow_stale: bool = False) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if not allow_stale and time.monotonic() - stored_at >= self.ttl:
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the oldest entry when full"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic(), value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        """Remove key from the cache if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any], refresh: bool = False) -> Any:
+        """Return the fresh cached value for key, otherwise call fetch() and cache its result.
+
+        refresh=True always calls fetch(). If fetch() raises and a stale value exists,
+        the stale value is returned instead when serve_stale is enabled.
+        """
+        value = None if refresh else self.get(key)
+        if value is not None:
+            return value
+        try:
+            value = fetch()
+        except Exception:
+            if not self.serve_stale:
+                raise
+            stale = self.get(key, allow_stale=True)
+            if stale is not None:
+                return stale
+            raise
+        self.set(key, value)
+        return value
@@ -0,0 +1,59 @@
+"""Shared HTTP client for the MCP functions.
+
+All upstream calls go through one pooled requests.Session so repeated calls to
+the same host reuse a warm connection.
+"""
+
+from typing import Any, Dict, Optional, Tuple, Union
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# (connect, read) timeout in seconds
+REQUEST_TIMEOUT = (3.05, 10)
+
+SESSION = requests.Session()
+SESSION.headers['User-Agent'] = "PublicAI-MCP-Server (+https://github.com/forpublicai/publicai-mcp-server)"
+
+_ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    # raise_on_status=False hands the last 5xx response back instead of raising
+    # RetryError, so it reaches raise_for_status() like any other error status
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False)
+)
+SESSION.mount("https://", _ADAPTER)
+SESSION.mount("http://", _ADAPTER)
+
+# Raised for 4xx/5xx responses, including 5xx responses that are still failing after
+# the retries above; the failed response is available as e.response
+HTTPError = requests.HTTPError
+
+
+class ParseError(ValueError):
+    """Raised when an upstream response body is not valid JSON"""
+
+
+def _parse(response: requests.Response) -> Any:
+    response.raise_for_status()
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise ParseError(f"Invalid JSON from {response.url}: {e}") from e
+
+
+def get_json(url: str, *, timeout: Union[float, Tuple[float, float]] = REQUEST_TIMEOUT) -> Dict[str, Any]:
+    """GET a URL and return the decoded JSON body"""
+    return _parse(SESSION.get(url, timeout=timeout))
+
+
+def post_json(
+    url: str,
+    data: Optional[Dict[str, Any]] = None,
+    *,
+    timeout: Union[float, Tuple[float, float]] = REQUEST_TIMEOUT
+) -> Dict[str, Any]:
+    """POST form-encoded data to a URL and return the decoded JSON body"""
+    return _parse(SESSION.post(url, data=data, timeout=timeout))
@@ -1,15 +1,42 @@
 """Singapore API-based MCP functions using data.gov.sg"""
 
 from fastmcp import FastMCP
-import json
-import urllib.request
 import urllib.parse
 from typing import List, Dict, Optional, Any
+from functions._cache import TTLCache
+from functions._http import get_json
 
 
 # HDB Carpark Information Dataset ID
 HDB_CARPARK_DATASET_ID = "d_23f946fa557947f93a8043bbef41dd09"
 
+# Carpark search against the HDB dataset; only the query and limit vary per call
+_CARPARK_SEARCH_TMPL = (
+    "https://data.gov.sg/api/action/datastore_search"
+    f"?resource_id={HDB_CARPARK_DATASET_ID}&fields=car_park_no,address&q={{query}}&limit={{limit}}"
+)
+
+# Real-time availability of all carparks, the URL takes no parameters
+CARPARK_AVAILABILITY_URL = "https://api.data.gov.sg/v1/transport/carpark-availability"
+
+# The HDB carpark list is effectively static, availability is refreshed upstream every minute.
+# An old availability snapshot would pass for live data, so report fetch failures instead.
+_CARPARK_SEARCH_CACHE = TTLCache(ttl=86400)
+_CARPARK_AVAILABILITY_CACHE = TTLCache(ttl=60, serve_stale=False)
+
+
+def _fetch_carpark_availability() -> Dict[str, Any]:
+    """Fetch the latest availability snapshot along with an index by carpark number"""
+    items = get_json(CARPARK_AVAILABILITY_URL).get('items', [])
+    latest = items[0] if items else None
+
+    # A carpark number can appear more than once in the feed, so index to lists
+    by_number: Dict[str, List[Dict[str, Any]]] = {}
+    for cp in (latest or {}).get('carpark_data', []):
+        by_number.setdefault(cp.get('carpark_number'), []).append(cp)
+
+    return {'latest': latest, 'by_number': by_number}
+
 
 def register_singapore_functions(mcp: FastMCP):
     """Register Singapore MCP functions"""
@@ -29,19 +56,12 @@ def register_singapore_functions(mcp: FastMCP):
             Dictionary with total results found and list of matching carparks with number and address
         """
         try:
-            params = {
-                'resource_id': HDB_CARPARK_DATASET_ID,
-                'q': query,
-                'fields': 'car_park_no,address',
-                'limit': min(limit, 100)
-            }
-
-            url = f"https://data.gov.sg/api/action/datastore_search?{urllib.parse.urlencode(params)}"
+            url = _CARPARK_SEARCH_TMPL.format(query=urllib.parse.quote(query, safe=''), limit=min(limit, 100))
 
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            data = _CARPARK_SEARCH_CACHE.get_or_fetch(url, lambda: get_json(url))
 
             if not data.get('success'):
+                _CARPARK_SEARCH_CACHE.discard(url)
                 return {"error": "Failed to search carparks", "details": data.get('error', {})}
 
             result = data.get('result', {})
@@ -79,22 +99,20 @@ def register_singapore_functions(mcp: FastMCP):
             Dictionary with timestamp and list of carparks with availability info
         """
         try:
-            url = "https://api.data.gov.sg/v1/transport/carpark-availability"
-
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            snapshot = _CARPARK_AVAILABILITY_CACHE.get_or_fetch(
+                CARPARK_AVAILABILITY_URL, _fetch_carpark_availability
+            )
 
-            items = data.get('items', [])
-            if not items:
+            latest = snapshot['latest']
+            if not latest:
                 return {"error": "No carpark data available"}
 
-            latest = items[0]
             timestamp = latest.get('timestamp', '')
             carpark_data = latest.get('carpark_data', [])
 
             # Filter by carpark number if specified
             if carpark_number:
-                carpark_data = [cp for cp in carpark_data if cp.get('carpark_number') == carpark_number]
+                carpark_data = snapshot['by_number'].get(carpark_number, [])
                 if not carpark_data:
                     return {
                         "error": f"Carpark '{carpark_number}' not found",
@@ -102,22 +120,21 @@ def register_singapore_functions(mcp: FastMCP):
                     }
 
             # Process carpark data
-            carparks = []
-            for cp in carpark_data[:limit]:
-                carpark_info = {
+            carparks = [
+                {
                     'carpark_number': cp.get('carpark_number', ''),
                     'update_datetime': cp.get('update_datetime', ''),
-                    'lots': []
+                    'lots': [
+                        {
+                            'lot_type': lot_info.get('lot_type', ''),
+                            'total_lots': lot_info.get('total_lots', ''),
+                            'lots_available': lot_info.get('lots_available', '')
+                        }
+                        for lot_info in cp.get('carpark_info', [])
+                    ]
                 }
-
-                for lot_info in cp.get('carpark_info', []):
-                    carpark_info['lots'].append({
-                        'lot_type': lot_info.get('lot_type', ''),
-                        'total_lots': lot_info.get('total_lots', ''),
-                        'lots_available': lot_info.get('lots_available', '')
-                    })
-
-                carparks.append(carpark_info)
+                for cp in carpark_data[:limit]
+            ]
 
             return {
                 'timestamp': timestamp,
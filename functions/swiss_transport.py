@@ -1,10 +1,25 @@
 """Swiss transport API-based MCP functions using transport.opendata.ch"""
 
 from fastmcp import FastMCP
-import json
-import urllib.request
 import urllib.parse
 from typing import List, Dict, Optional, Any
+from functions._http import get_json
+
+
+# Ask the stationboard API for only the fields get_swiss_departures reads, instead of
+# the full pass list, coordinates and capacity data it sends for every departure
+_STATIONBOARD_FIELDS = "".join(f"&fields[]={field}" for field in (
+    'station/id',
+    'station/name',
+    'stationboard/stop/departure',
+    'stationboard/stop/prognosis/departure',
+    'stationboard/stop/delay',
+    'stationboard/stop/platform',
+    'stationboard/category',
+    'stationboard/number',
+    'stationboard/to',
+    'stationboard/operator',
+))
 
 
 def register_swiss_transport_functions(mcp: FastMCP):
@@ -19,22 +34,19 @@ def register_swiss_transport_functions(mcp: FastMCP):
             limit: Maximum number of results to return (default: 10)
 
         Returns:
-            List of stations with id, name, and coordinates
+            List of stations with id, name, flat lat/lon coordinates, and type
         """
         try:
             url = f"http://transport.opendata.ch/v1/locations?query={urllib.parse.quote(query)}"
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            data = get_json(url)
 
             stations = data.get('stations', [])[:limit]
             return [
                 {
                     'id': s['id'],
                     'name': s['name'],
-                    'coordinates': {
-                        'lat': s['coordinate']['x'],
-                        'lon': s['coordinate']['y']
-                    },
+                    'lat': s['coordinate']['x'],
+                    'lon': s['coordinate']['y'],
                     'type': s.get('icon', 'unknown')
                 }
                 for s in stations
@@ -54,9 +66,8 @@ def register_swiss_transport_functions(mcp: FastMCP):
             Dictionary with station info and list of upcoming departures with delays
         """
         try:
-            url = f"http://transport.opendata.ch/v1/stationboard?station={urllib.parse.quote(station)}&limit={min(limit, 40)}"
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            url = f"http://transport.opendata.ch/v1/stationboard?station={urllib.parse.quote(station)}&limit={min(limit, 40)}{_STATIONBOARD_FIELDS}"
+            data = get_json(url)
 
             station_info = data.get('station', {})
             stationboard = data.get('stationboard', [])
@@ -112,8 +123,7 @@ def register_swiss_transport_functions(mcp: FastMCP):
             if via_station:
                 url += f"&via[]={urllib.parse.quote(via_station)}"
 
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            data = get_json(url)
 
             connections = data.get('connections', [])
 
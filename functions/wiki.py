@@ -1,16 +1,90 @@
 """Wiki-based MCP functions for accessing community-maintained data from wiki.publicai.co"""
 
 from fastmcp import FastMCP
-import json
-import urllib.request
 import urllib.parse
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Tuple
+import orjson
+from functions._cache import TTLCache
+from functions._http import HTTPError, get_json, post_json
 
 
 # MediaWiki API Configuration
 WIKI_BASE_URL = "https://wiki.publicai.co"
 WIKI_API_URL = f"{WIKI_BASE_URL}/w/api.php"
 
+# Prebuilt API URLs; only the per-call parts are quoted and filled in
+TOOLS_FIELDS = "_pageName=Page,description,community,has_resources"
+_TOOLS_QUERY_TMPL = (
+    f"{WIKI_API_URL}?action=cargoquery&format=json&tables=Tools"
+    f"&fields={urllib.parse.quote(TOOLS_FIELDS, safe='')}&where={{where}}&limit={{limit}}"
+)
+_CARGOFIELDS_TMPL = f"{WIKI_API_URL}?action=cargofields&format=json&table={{table}}"
+_CSRF_TOKEN_URL = f"{WIKI_API_URL}?action=query&meta=tokens&format=json"
+
+# Worker pool for issuing independent wiki requests concurrently
+_POOL = ThreadPoolExecutor(max_workers=8)
+
+# Cargo table schemas only change with wiki schema migrations,
+# community tool listings change as tools are added on the wiki
+_SCHEMA_CACHE = TTLCache(ttl=86400)
+_COMMUNITY_TOOLS_CACHE = TTLCache(ttl=300)
+
+# Tables found missing are remembered briefly, since use_tool prefetches a schema
+# for every tool, including the many that have no resource table. Callers that
+# actually need the table recheck with refresh=True before reporting it missing.
+_MISSING_TABLES_CACHE = TTLCache(ttl=300, maxsize=1024)
+
+# Tables whose schema was rechecked after a failed resource query, so a query
+# that keeps failing for other reasons doesn't refetch the schema on every call
+_SCHEMA_RECHECKED_CACHE = TTLCache(ttl=300, maxsize=1024)
+
+
+def _get_cargofields(table: str, refresh: bool = False) -> Dict[str, Any]:
+    """Return the field schema of a Cargo table, or an empty dict if the table doesn't exist.
+
+    Schemas are cached for a day and missing tables for five minutes; pass
+    refresh=True to bypass a possibly outdated copy.
+    """
+    if not refresh and _MISSING_TABLES_CACHE.get(table):
+        return {}
+
+    def fetch():
+        fields_url = _CARGOFIELDS_TMPL.format(table=urllib.parse.quote(table, safe=''))
+        return get_json(fields_url).get('cargofields', {})
+
+    cargo_fields = _SCHEMA_CACHE.get_or_fetch(table, fetch, refresh=refresh)
+    if cargo_fields:
+        _MISSING_TABLES_CACHE.discard(table)
+    else:
+        # Keep missing tables out of the day-long cache, they can be created on the wiki at any time
+        _SCHEMA_CACHE.discard(table)
+        _MISSING_TABLES_CACHE.set(table, True)
+    return cargo_fields
+
+
+def _normalize_tool(tool: str) -> Tuple[str, str]:
+    """Return the canonical page name and bare name of a tool, e.g. ("Tool:SuicideHotline", "SuicideHotline")"""
+    tool_name = tool[len('Tool:'):] if tool.startswith('Tool:') else tool
+    return f'Tool:{tool_name}', tool_name
+
+
+def _loads_repairing_braces(text: str) -> Any:
+    """Parse a JSON string, retrying once with missing closing braces appended.
+
+    Raises the original decode error if the input can't be repaired that way.
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        missing_braces = text.count('{') - text.count('}')
+        if missing_braces <= 0:
+            raise
+        try:
+            return orjson.loads(text + '}' * missing_braces)
+        except orjson.JSONDecodeError:
+            raise e from None
+
 
 def register_wiki_functions(mcp: FastMCP):
     """Register wiki-based MCP functions"""
@@ -26,27 +100,14 @@ def register_wiki_functions(mcp: FastMCP):
             List of tools with page name, description, community, and whether they have resources
         """
         try:
-            fields = "_pageName=Page,description,community,has_resources"
             where = f"community HOLDS \"{community}\""
+            url = _TOOLS_QUERY_TMPL.format(where=urllib.parse.quote(where, safe=''), limit=500)
 
-            params = {
-                'action': 'cargoquery',
-                'format': 'json',
-                'tables': 'Tools',
-                'fields': fields,
-                'where': where,
-                'limit': '500'
-            }
-
-            url = f"{WIKI_API_URL}?{urllib.parse.urlencode(params)}"
-
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            def fetch():
+                cargo_query = get_json(url).get('cargoquery', [])
+                return [item.get('title', {}) for item in cargo_query]
 
-            cargo_query = data.get('cargoquery', [])
-            results = [item.get('title', {}) for item in cargo_query]
-
-            return results
+            return _COMMUNITY_TOOLS_CACHE.get_or_fetch(community, fetch)
         except Exception as e:
             return [{"error": f"Failed to list tools for community: {str(e)}"}]
 
@@ -65,26 +126,20 @@ def register_wiki_functions(mcp: FastMCP):
         """
         try:
             # Ensure proper page name format
-            if not tool.startswith('Tool:'):
-                tool = f'Tool:{tool}'
+            tool, tool_name = _normalize_tool(tool)
 
             # First, get the tool metadata to check if it has resources
-            tool_fields = "_pageName=Page,description,community,has_resources"
             tool_where = f"_pageName='{tool}'"
+            tool_url = _TOOLS_QUERY_TMPL.format(where=urllib.parse.quote(tool_where, safe=''), limit=1)
 
-            tool_params = {
-                'action': 'cargoquery',
-                'format': 'json',
-                'tables': 'Tools',
-                'fields': tool_fields,
-                'where': tool_where,
-                'limit': '1'
-            }
-
-            tool_url = f"{WIKI_API_URL}?{urllib.parse.urlencode(tool_params)}"
+            # Construct resource table name
+            # e.g., "Tool:SuicideHotline" -> "SuicideHotlineResources"
+            resource_table = f"{tool_name}Resources"
 
-            with urllib.request.urlopen(tool_url, timeout=10) as response:
-                tool_data = json.loads(response.read().decode())
+            # The table schema is only needed for tools with resources, but it
+            # doesn't depend on the metadata, so look both up at once
+            fields_future = _POOL.submit(_get_cargofields, resource_table)
+            tool_data = get_json(tool_url)
 
             cargo_query = tool_data.get('cargoquery', [])
             if not cargo_query:
@@ -109,33 +164,17 @@ def register_wiki_functions(mcp: FastMCP):
                         'usage': f'use_tool(tool="{tool}", country="Singapore") or use_tool(tool="{tool}", country="Switzerland")'
                     }
 
-                # Extract tool name and construct resource table name
-                # e.g., "Tool:SuicideHotline" -> "SuicideHotlineResources"
-                tool_name = tool.replace('Tool:', '')
-                resource_table = f"{tool_name}Resources"
-
                 try:
-                    # First, get the table schema using cargofields API
-                    fields_params = {
-                        'action': 'cargofields',
-                        'format': 'json',
-                        'table': resource_table
-                    }
-
-                    fields_url = f"{WIKI_API_URL}?{urllib.parse.urlencode(fields_params)}"
-
-                    with urllib.request.urlopen(fields_url, timeout=10) as response:
-                        fields_data = json.loads(response.read().decode())
-
-                    # Extract field names from the cargofields response
-                    cargo_fields = fields_data.get('cargofields', {})
+                    # Wait for the table schema requested alongside the metadata
+                    cargo_fields = fields_future.result()
+                    if not cargo_fields:
+                        # The table may have been created since it was last seen missing
+                        cargo_fields = _get_cargofields(resource_table, refresh=True)
                     if not cargo_fields:
                         result['resources'] = []
                         result['warning'] = f"Resource table '{resource_table}' not found or has no fields"
                         return result
 
-                    all_fields = ','.join(cargo_fields.keys())
-
                     # Build WHERE clause for resources
                     where_clauses = [f"tool='{tool}'", f"country='{country}'"]
                     if region:
@@ -143,25 +182,39 @@ def register_wiki_functions(mcp: FastMCP):
 
                     resource_where = ' AND '.join(where_clauses)
 
-                    # Now query with all available fields
-                    resource_params = {
-                        'action': 'cargoquery',
-                        'format': 'json',
-                        'tables': resource_table,
-                        'fields': all_fields,
-                        'where': resource_where,
-                        'limit': '500'
-                    }
-
-                    resource_url = f"{WIKI_API_URL}?{urllib.parse.urlencode(resource_params)}"
-
-                    with urllib.request.urlopen(resource_url, timeout=10) as response:
-                        resource_data = json.loads(response.read().decode())
+                    def query_resources(fields: Dict[str, Any]) -> Dict[str, Any]:
+                        # Query with all available fields
+                        resource_params = {
+                            'action': 'cargoquery',
+                            'format': 'json',
+                            'tables': resource_table,
+                            'fields': ','.join(fields.keys()),
+                            'where': resource_where,
+                            'limit': '500'
+                        }
+                        return get_json(f"{WIKI_API_URL}?{urllib.parse.urlencode(resource_params)}")
+
+                    resource_data = query_resources(cargo_fields)
+
+                    if 'error' in resource_data and not _SCHEMA_RECHECKED_CACHE.get(resource_table):
+                        # The cached schema may list a column since renamed or removed on the wiki,
+                        # so recheck it and retry once if it changed
+                        _SCHEMA_RECHECKED_CACHE.set(resource_table, True)
+                        fresh_fields = _get_cargofields(resource_table, refresh=True)
+                        if not fresh_fields:
+                            result['resources'] = []
+                            result['warning'] = f"Resource table '{resource_table}' not found or has no fields"
+                            return result
+                        if fresh_fields != cargo_fields:
+                            resource_data = query_resources(fresh_fields)
+
+                    if 'error' in resource_data:
+                        result['warning'] = f"Resource table '{resource_table}' not found or query failed"
 
                     resources = [item.get('title', {}) for item in resource_data.get('cargoquery', [])]
                     result['resources'] = resources
 
-                except urllib.error.HTTPError as e:
+                except HTTPError as e:
                     # Resource table doesn't exist or other HTTP error
                     result['resources'] = []
                     result['warning'] = f"Resource table '{resource_table}' not found or query failed"
@@ -177,8 +230,7 @@ def register_wiki_functions(mcp: FastMCP):
 
                 parse_url = f"{WIKI_API_URL}?{urllib.parse.urlencode(parse_params)}"
 
-                with urllib.request.urlopen(parse_url, timeout=10) as response:
-                    parse_data = json.loads(response.read().decode())
+                parse_data = get_json(parse_url)
 
                 parse_result = parse_data.get('parse', {})
                 result['content'] = parse_result.get('text', {}).get('*', '')
@@ -212,48 +264,27 @@ def register_wiki_functions(mcp: FastMCP):
         try:
             # Parse the JSON string into a dictionary
             try:
-                resource_data = json.loads(resource_data_json)
-            except json.JSONDecodeError as e:
-                # Try to auto-fix common JSON errors (missing closing brace)
-                try:
-                    # Count opening and closing braces
-                    open_braces = resource_data_json.count('{')
-                    close_braces = resource_data_json.count('}')
-
-                    if open_braces > close_braces:
-                        # Add missing closing braces
-                        fixed_json = resource_data_json + ('}' * (open_braces - close_braces))
-                        resource_data = json.loads(fixed_json)
-                    else:
-                        raise e  # Re-raise original error
-                except:
-                    return {
-                        "error": f"Invalid JSON in resource_data_json: {str(e)}",
-                        "hint": "Ensure resource_data_json is a valid JSON string",
-                        "received": resource_data_json
-                    }
-            # Ensure proper page name format
-            if not tool.startswith('Tool:'):
-                tool = f'Tool:{tool}'
+                resource_data = _loads_repairing_braces(resource_data_json)
+            except orjson.JSONDecodeError as e:
+                return {
+                    "error": f"Invalid JSON in resource_data_json: {str(e)}",
+                    "hint": "Ensure resource_data_json is a valid JSON string",
+                    "received": resource_data_json
+                }
 
-            # Extract tool name for template and table lookup
-            tool_name = tool.replace('Tool:', '')
+            # Ensure proper page name format, keeping the bare name for template and table lookup
+            tool, tool_name = _normalize_tool(tool)
             resource_table = f"{tool_name}Resources"
             template_name = f"{tool_name}Resource"
 
-            # Get the table schema using cargofields API to validate fields
-            fields_params = {
-                'action': 'cargofields',
-                'format': 'json',
-                'table': resource_table
-            }
-
-            fields_url = f"{WIKI_API_URL}?{urllib.parse.urlencode(fields_params)}"
+            # Get CSRF token for editing; it doesn't depend on the schema, so fetch it while validating
+            token_future = _POOL.submit(get_json, _CSRF_TOKEN_URL)
 
-            with urllib.request.urlopen(fields_url, timeout=10) as response:
-                fields_data = json.loads(response.read().decode())
-
-            cargo_fields = fields_data.get('cargofields', {})
+            # Get the table schema using cargofields API to validate fields
+            cargo_fields = _get_cargofields(resource_table)
+            if not cargo_fields:
+                # The table may have been created since it was last seen missing
+                cargo_fields = _get_cargofields(resource_table, refresh=True)
             if not cargo_fields:
                 return {
                     "error": f"Resource table '{resource_table}' not found. This tool may not support resources.",
@@ -273,44 +304,31 @@ def register_wiki_functions(mcp: FastMCP):
             # Add all provided resource data
             template_params.update(resource_data)
 
-            # Validate that provided fields exist in the schema
-            invalid_fields = []
-            for field in template_params.keys():
-                if field not in cargo_fields:
-                    invalid_fields.append(field)
+            # Validate that provided fields exist in the schema (key views are set-like)
+            invalid_fields = template_params.keys() - cargo_fields.keys()
+
+            if invalid_fields:
+                # The cached schema may predate a change on the wiki, so recheck against a fresh copy
+                cargo_fields = _get_cargofields(resource_table, refresh=True)
+                invalid_fields = template_params.keys() - cargo_fields.keys()
 
             if invalid_fields:
                 return {
-                    "error": f"Invalid field(s): {', '.join(invalid_fields)}",
+                    "error": f"Invalid field(s): {', '.join(sorted(invalid_fields))}",
                     "valid_fields": list(cargo_fields.keys()),
                     "field_types": {k: v['type'] for k, v in cargo_fields.items()}
                 }
 
-            # Generate the wikitext template
-            wikitext_lines = ["{{" + template_name]
-            for key, value in template_params.items():
-                # Include all fields (even empty ones for clarity)
-                wikitext_lines.append(f"|{key}={value}")
-            wikitext_lines.append("}}\n")
-
-            wikitext = "\n".join(wikitext_lines)
+            # Generate the wikitext template, leaving out empty fields
+            body = "\n".join(f"|{key}={value}" for key, value in template_params.items() if value not in ("", None))
+            wikitext = f"{{{{{template_name}\n{body}\n}}}}\n"
 
             # Construct resource page name
             resource_page = f"Resource:{tool_name}/{country}"
             if region:
                 resource_page = f"{resource_page}/{region}"
 
-            # Get CSRF token for editing
-            token_params = {
-                'action': 'query',
-                'meta': 'tokens',
-                'format': 'json'
-            }
-
-            token_url = f"{WIKI_API_URL}?{urllib.parse.urlencode(token_params)}"
-            with urllib.request.urlopen(token_url, timeout=10) as response:
-                token_data = json.loads(response.read().decode())
-
+            token_data = token_future.result()
             csrf_token = token_data['query']['tokens']['csrftoken']
 
             # Use MediaWiki edit API with prependtext to safely add content at the top
@@ -324,11 +342,7 @@ def register_wiki_functions(mcp: FastMCP):
             }
 
             # Make the edit request
-            post_data = urllib.parse.urlencode(edit_params).encode('utf-8')
-            req = urllib.request.Request(WIKI_API_URL, data=post_data)
-
-            with urllib.request.urlopen(req, timeout=10) as response:
-                edit_result = json.loads(response.read().decode())
+            edit_result = post_json(WIKI_API_URL, edit_params)
 
             # Check if edit was successful
             if 'edit' in edit_result and edit_result['edit'].get('result') == 'Success':
@@ -350,8 +364,7 @@ def register_wiki_functions(mcp: FastMCP):
                     'generated_wikitext': wikitext.strip()
                 }
 
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode() if e.fp else str(e)
-            return {"error": f"HTTP error while adding resource: {e.code} {e.reason}", "details": error_body}
+        except HTTPError as e:
+            return {"error": f"HTTP error while adding resource: {e.response.status_code} {e.response.reason}", "details": e.response.text}
         except Exception as e:
             return {"error": f"Failed to add resource: {str(e)}"}